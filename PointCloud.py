@@ -1,6 +1,6 @@
 import numpy as np
 from math import pi
-from scipy.spatial import Delaunay
+from scipy.spatial import Delaunay, cKDTree
 
 
 class PointCloud:
@@ -13,6 +13,28 @@ class PointCloud:
         """
         self.xyz = points
 
+    @property
+    def xyz(self):
+        return self._xyz
+
+    @xyz.setter
+    def xyz(self, points):
+        self._xyz = points
+        # The spatial index is built on demand from the current points
+        self._tree = None
+
+    @property
+    def tree(self):
+        """
+        A KD-tree of the points, built the first time it is used and
+        kept until the points are changed
+
+        :return: scipy.spatial.cKDTree of the points
+        """
+        if self._tree is None:
+            self._tree = cKDTree(self.xyz)
+        return self._tree
+
     @staticmethod
     def from_depth(depth, fov=(69.4, 42.5)):
         x_size = depth.shape[1]
@@ -40,6 +62,7 @@ class PointCloud:
 
     def __setitem__(self, key, value):
         self.xyz[key] = value
+        self._tree = None
 
     def transform(self, rotation_matrix=np.eye(3), shift_matrix=np.asarray([0, 0, 0])):
         """
@@ -150,3 +173,85 @@ class PointCloud:
                                    (selected_points,),
                                    replace=False)
         return PointCloud(self.xyz[indices])
+
+    def voxel_downsample(self, leaf_size=0.01):
+        """
+        Finds the mean of all points within each cube of a voxel grid,
+        giving a point cloud of spatially even density. Like filter,
+        a new point cloud is returned and this one is left unchanged
+
+        :param leaf_size: the side of the voxels
+        :return: PointCloud of the centroids of the occupied voxels
+        """
+        if self.xyz.shape[0] == 0:
+            return PointCloud(self.xyz)
+        voxels = np.floor((self.xyz - np.min(self.xyz, axis=0)) / leaf_size).astype(np.int64)  # [p, 3]
+        # Hash the voxel coordinates into one key per point
+        dims = np.max(voxels, axis=0) + 1
+        keys = (voxels[:, 0] * dims[1] + voxels[:, 1]) * dims[2] + voxels[:, 2]  # [p,]
+        _, inverse, counts = np.unique(keys, return_inverse=True, return_counts=True)
+        inverse = inverse.reshape(-1)
+        centroids = [np.bincount(inverse, weights=self.xyz[:, axis]) / counts for axis in range(3)]
+        return PointCloud(np.stack(centroids, axis=-1))  # [v, 3]
+
+    def remove_statistical_outliers(self, num_neighbours=8, std_ratio=2.0):
+        """
+        Removes points whose mean distance to their nearest neighbours
+        is larger than std_ratio standard deviations above the mean of
+        all points, such as stray noise points and flying pixels
+
+        On evenly spaced points the standard deviation is close to zero,
+        which would remove the points along the edges of the point cloud.
+        Therefore points are never removed if their mean distance is
+        within twice the median of all points
+
+        :param num_neighbours: number of neighbours for the mean distance
+        :param std_ratio: the number of standard deviations that is accepted
+        :return: points that are not outliers
+        """
+        if self.xyz.shape[0] <= num_neighbours:
+            return self
+        # The nearest neighbour of each point is the point itself
+        distances, _ = self.tree.query(self.xyz, k=num_neighbours + 1)
+        mean_distances = np.mean(distances[:, 1:], axis=-1)  # [p,]
+        threshold = max(np.mean(mean_distances) + std_ratio * np.std(mean_distances),
+                        2 * np.median(mean_distances))
+        self.xyz = self.xyz[mean_distances <= threshold]
+        return self
+
+    def spacing(self, num_samples=1000):
+        """
+        Estimates the typical distance between neighbouring points as the
+        median distance to the nearest neighbour of a subset of the points
+
+        :param num_samples: the approximate number of points in the subset
+        :return: the median nearest neighbour distance
+        """
+        samples = self.xyz[::max(1, self.xyz.shape[0] // num_samples)]
+        # The nearest neighbour of each point is the point itself
+        distances, _ = self.tree.query(samples, k=2)
+        return np.median(distances[:, 1])
+
+    def remove_radius_outliers(self, radius=None, min_points=4, spacing_ratio=3.0):
+        """
+        Removes points with fewer than min_points other points within radius
+
+        The radius is by default set relative to the spacing of the points,
+        so that the number of neighbours of a point stays about the same
+        for any camera distance and resolution. With a spacing ratio of 3,
+        points inside an evenly spaced surface have about 28 neighbours,
+        points on its edges about 14 and points in its corners about 7
+
+        :param radius: the radius of the neighbourhood of each point,
+        None for spacing_ratio times the spacing of the points
+        :param min_points: the least number of neighbours of a point that is kept
+        :param spacing_ratio: the radius relative to the spacing, if radius is None
+        :return: points that are not outliers
+        """
+        if self.xyz.shape[0] <= min_points:
+            return self
+        if radius is None:
+            radius = spacing_ratio * self.spacing()
+        counts = self.tree.query_ball_point(self.xyz, radius, return_length=True)
+        self.xyz = self.xyz[counts > min_points]
+        return self
@@ -4,12 +4,12 @@ from mpl_toolkits import mplot3d
 import cv2
 
 
-def plot_point_cloud(point_cloud: PointCloud, figure=None):
+def plot_point_cloud(point_cloud: PointCloud, figure=None, leaf_size=0.02):
     if not figure:
         figure = plt.figure()
         plt.ion()
     ax = plt.axes(projection="3d")
-    pc = point_cloud.filter()
+    pc = point_cloud.voxel_downsample(leaf_size)
     ax.scatter3D(pc[:, 0],
                  pc[:, 1],
                  pc[:, 2],
@@ -21,9 +21,9 @@ def plot_point_cloud(point_cloud: PointCloud, figure=None):
     return figure
 
 
-def get_pc_image(pc: PointCloud):
+def get_pc_image(pc: PointCloud, leaf_size=0.02):
     ax = plt.axes(projection="3d")
-    pc = pc.filter()
+    pc = pc.voxel_downsample(leaf_size)
     ax.scatter3D(pc[:, 0],
                  pc[:, 1],
                  pc[:, 2],
@@ -12,6 +12,12 @@ The images can be visualised using the display_images
 function. The input to this function is the same as the
 output from RSCamera().capture_images(), for convenience
 
+For a live preview at the sensor frame rate, use
+RSCamera().capture_preview() together with a PreviewDisplay
+object. The preview keeps the native BGR channel order and
+the raw depth units so that no conversions are needed per
+frame, and alignment is skipped unless asked for.
+
 Images are saved and loaded with the same resolution of
 (640, 480). To change this, source code changes are
 necessary.
@@ -69,6 +75,26 @@ class RSCamera:
         color_image = cv2.cvtColor(color_image, cv2.COLOR_BGR2RGB)
         return color_image, depth_image * self.depth_scale
 
+    def capture_preview(self, align=False):
+        """
+        Captures a BGR image and a raw depth map from the camera
+        for previewing. No channel switching or depth scaling is done,
+        and the depth is only aligned to the color image if asked for
+
+        :param align: whether to align the depth map to the color image
+        :return: bgr image, depth map image in raw depth units (uint16)
+        """
+        frames = self.pipe.wait_for_frames()
+        if align:
+            frames = self.align.process(frames)
+        depth_frame = frames.get_depth_frame()
+        color_frame = frames.get_color_frame()
+        if not color_frame or not depth_frame:
+            print("Could not capture frame(s)...")
+        depth_image = np.asanyarray(depth_frame.get_data())
+        color_image = np.asanyarray(color_frame.get_data())
+        return color_image, depth_image
+
     def close(self):
         self.pipe.stop()
 
@@ -112,6 +138,59 @@ def display_images(color_image, depth_image):
     return cv2.waitKey(5)
 
 
+class PreviewDisplay:
+    def __init__(self, depth_scale, step=1, window_name='RealSense'):
+        """
+        Displays color images and raw depth maps from
+        RSCamera().capture_preview() beside each other in a window.
+
+        The raw depth map is scaled and colored by cv2 directly into
+        the displayed image, which is reused between frames, so showing
+        a frame does not allocate any full-size images
+
+        :param depth_scale: the depth scale of the camera, RSCamera().depth_scale
+        :param step: downscaling of the preview, the width and height are divided by step
+        :param window_name: name of the preview window
+        """
+        self.step = step
+        self.window_name = window_name
+        # Scales raw depth units so that the maximum depth gives 255
+        self.alpha = 255 * depth_scale / RSCamera.maximum_depth
+        self.images = None
+        self.depth_gray = None
+        cv2.namedWindow(self.window_name, cv2.WINDOW_AUTOSIZE)
+
+    def show(self, color_image, depth_image):
+        """
+        Shows a BGR image and a raw depth map beside each other
+
+        :param color_image: a BGR image (height, width, channels)
+        :param depth_image: a raw depth map (height, width) in depth units
+        :return: the cv2 key-code that is pressed during the time
+        the window was shown
+        """
+        height, width = depth_image.shape[0] // self.step, depth_image.shape[1] // self.step
+        if self.images is None or self.images.shape[:2] != (height, 2 * width):
+            self.images = np.empty((height, 2 * width, 3), dtype=np.uint8)
+            self.depth_gray = np.empty((height, width), dtype=np.uint8)
+
+        # Resize color image to the downscaled depth image for display
+        if color_image.shape[:2] != (height, width):
+            cv2.resize(color_image, dsize=(width, height), dst=self.images[:, :width],
+                       interpolation=cv2.INTER_NEAREST)
+        else:
+            self.images[:, :width] = color_image
+        if self.step > 1:
+            depth_image = cv2.resize(depth_image, dsize=(width, height),
+                                     interpolation=cv2.INTER_NEAREST)
+        # Apply colormap on depth image (image must be converted to 8-bit per pixel first)
+        cv2.convertScaleAbs(depth_image, dst=self.depth_gray, alpha=self.alpha)
+        cv2.applyColorMap(self.depth_gray, cv2.COLORMAP_INFERNO, dst=self.images[:, width:])
+
+        cv2.imshow(self.window_name, self.images)
+        return cv2.waitKey(5)
+
+
 def save_images(depth_image, color_image, path):
     """
     Saves the depth and the color image
@@ -1,13 +1,17 @@
 import numpy as np
-from RSCamera import RSCamera
 from PointCloud import PointCloud
 
 
 class VolumeSensor:
-    def __init__(self, cfg: dict):
+    def __init__(self, cfg: dict, depth_camera=None):
         self.volume_empty = cfg["volume_empty"]
         self.volume_full = cfg["volume_full"]
-        self.depth_camera = RSCamera()
+        # Any object with a capture_images method like RSCamera can be used as camera,
+        # RSCamera is only imported when needed since it requires the RealSense SDK
+        if depth_camera is None:
+            from RSCamera import RSCamera
+            depth_camera = RSCamera()
+        self.depth_camera = depth_camera
         self.rgb = None
         self.depth = None
         self.point_cloud = None
@@ -25,18 +29,45 @@ class VolumeSensor:
                                     cfg["var_border_min_y"]],
                                    [cfg["var_border_max_z"],
                                     cfg["var_border_min_z"]]])
+        # Outlier removal ("none", "statistical" or "radius") and downsampling,
+        # both are turned off unless set in the config since they change the
+        # calibrated volumes
+        self.outlier_filter = cfg.get("outlier_filter", "none")
+        if self.outlier_filter not in ("none", "statistical", "radius"):
+            raise ValueError("Unknown outlier filter: " + str(self.outlier_filter))
+        self.outlier_std_ratio = cfg.get("var_outlier_std_ratio", 2.0)
+        # A radius of 0 sets the radius relative to the spacing of the points
+        self.outlier_radius = cfg.get("var_outlier_radius", 0.) or None
+        self.outlier_spacing_ratio = cfg.get("var_outlier_spacing_ratio", 3.0)
+        self.outlier_min_points = int(cfg.get("var_outlier_min_points", 4))
+        self.voxel_size = cfg.get("var_voxel_size", 0.)
         # self.measure_fill_rate()
 
     def measure_depth(self):
         self.rgb, self.depth = self.depth_camera.capture_images()
-        self.point_cloud = PointCloud.from_depth(self.depth).\
+        return self.process_depth(self.depth)
+
+    def process_depth(self, depth):
+        self.point_cloud = PointCloud.from_depth(depth).\
             select_roi(self.shift,
                        self.rotation,
                        self.borders)
+        # Outliers are removed before downsampling while they still stand out
+        if self.outlier_filter == "statistical":
+            self.point_cloud.remove_statistical_outliers(std_ratio=self.outlier_std_ratio)
+        elif self.outlier_filter == "radius":
+            self.point_cloud.remove_radius_outliers(self.outlier_radius,
+                                                    self.outlier_min_points,
+                                                    self.outlier_spacing_ratio)
+        if self.voxel_size > 0:
+            self.point_cloud = self.point_cloud.voxel_downsample(self.voxel_size)
         return self.point_cloud
 
     def measure_fill_rate(self):
         self.measure_depth()
+        return self.compute_fill_rate()
+
+    def compute_fill_rate(self):
         volume = self.point_cloud.to_volume()
         self.fill_rate = 1 - (volume - self.volume_full) / (self.volume_empty - self.volume_full)
         return self.fill_rate
@@ -10,19 +10,32 @@ The script will save aligned depth images and rgb images
 to a folder where the module is run from. The depth images
 will be saved in a .raw format. To extract back the depths
 from the .raw files, check the RSCamera module.
+
+The live preview shows the unaligned camera streams by default
+to keep up with the sensor frame rate, aligned full resolution
+images are only captured when an image is saved. Use the
+arguments of main to align or downscale the preview.
 """
 
 import cv2
 from time import sleep
 import os
-from RSCamera import RSCamera, display_images, save_images
+from RSCamera import RSCamera, PreviewDisplay, save_images
 
 
 PATH_DIR = "data/"
 
 
-def main():
+def main(align_preview=False, preview_step=1):
+    """
+    Runs the image capturing application
+
+    :param align_preview: whether to align the depth map to the color image in the preview
+    :param preview_step: downscaling of the preview, the width and height are divided by step
+    :return: None
+    """
     cam = RSCamera()
+    preview = PreviewDisplay(cam.depth_scale, step=preview_step)
     image_id = 0
     # create the data folder for saving images
     if not os.path.exists(PATH_DIR):
@@ -39,11 +52,13 @@ def main():
         print("Next image ID in sequence: ", str(image_id).zfill(6))
 
     while image_id < 1000000:  # paths should not exceed this
-        # Get coherent set of frames [depth and color]
-        color_image, depth_image = cam.capture_images()
-        key = display_images(color_image, depth_image)
+        # Get coherent set of frames [depth and color] for the preview
+        color_image, depth_image = cam.capture_preview(align=align_preview)
+        key = preview.show(color_image, depth_image)
         if key & 0xFF == ord('s'):  # save image
             print("Saving image...")
+            # Capture aligned full resolution frames for saving
+            color_image, depth_image = cam.capture_images()
             image_path = PATH_DIR + str(image_id).zfill(6)
             print("path to image: ", image_path)
             save_images(depth_image, color_image, image_path)
@@ -0,0 +1,525 @@
+"""
+Module for evaluating the accuracy and the speed of the volume sensor
+
+The VolumeSensor is run on synthetic containers with a known
+volume as well as on labelled recorded sessions, while sweeping
+the camera distance, the depth resolution, the depth noise and
+the rate of holes (invalid pixels) in the depth maps as well as
+the voxel size and the outlier filter of the point cloud. For each
+configuration the error in fill rate (and volume, for synthetic
+scenes) is reported together with the wall-clock time and the peak
+memory of processing one depth map into a fill rate.
+
+To run the evaluation on synthetic scenes, run the main function:
+    evaluate_volume_sensor.main()
+
+To also evaluate a recorded session, give the path to a folder
+with depth maps saved by the depth_camera_capture module:
+    evaluate_volume_sensor.main(session_path="data/")
+The folder needs a labels.csv file where each line holds the image
+id and the labelled fill rate of that image, e.g. "000012,0.5".
+Images labelled 0.0 and 1.0 are used to calibrate the empty and the
+full volume of the container and are left out of the evaluation.
+
+The noise and the hole rate are conditions of the scene rather than
+settings of the sensor, so the results are summarised for each
+setting (scene source, distance, resolution, voxel size and outlier
+filter) with the worst error across all conditions. The summaries are
+printed as a table where the settings on the Pareto front of fill rate
+error versus time of each scene source are marked, and saved to a csv
+file together with the results for each condition. Use
+fastest_within_tolerance to find the fastest setting that meets a fill
+rate tolerance.
+
+Synthetic scenes can be evaluated without the RealSense SDK installed.
+"""
+
+import os
+import tracemalloc
+from itertools import product
+from math import pi
+from time import perf_counter
+import numpy as np
+from VolumeSensor import VolumeSensor
+from config import read_config
+
+
+FIELD_OF_VIEW = (69.4, 42.5)  # same as the default of PointCloud.from_depth
+SETTING_KEYS = ["scene", "distance", "width", "height", "voxel_size", "outlier_filter"]
+RESULT_KEYS = SETTING_KEYS + ["noise", "hole_rate",
+                              "fill_error", "max_fill_error", "volume_error", "time", "memory"]
+SUMMARY_KEYS = SETTING_KEYS + ["fill_error", "max_fill_error", "volume_error", "time", "memory", "pareto"]
+
+
+def degrade_depth(depth, resolution=None, noise=0., hole_rate=0., rng=None):
+    """
+    Degrades a depth map to simulate a camera of lower quality
+
+    The resolution is changed with nearest neighbour sampling since
+    interpolating between invalid (0.0) and valid depths gives
+    incorrect depths. The noise is normal distributed with a standard
+    deviation that grows with the square of the depth, as for stereo cameras
+
+    :param depth: depth map in meters (height, width)
+    :param resolution: the resolution (width, height) of the output, None keeps it
+    :param noise: standard deviation of the noise in meters at a depth of 1 meter
+    :param hole_rate: the fraction of pixels that are set to invalid (0.0)
+    :param rng: numpy random generator, a new unseeded generator if None
+    :return: degraded depth map
+    """
+    if rng is None:
+        rng = np.random.default_rng()
+    if resolution is not None and (resolution[1], resolution[0]) != depth.shape:
+        rows = np.arange(resolution[1]) * depth.shape[0] // resolution[1]
+        cols = np.arange(resolution[0]) * depth.shape[1] // resolution[0]
+        depth = depth[rows[:, np.newaxis], cols]
+    depth = np.array(depth, dtype=float)
+    valid = depth > 0
+    if noise > 0:
+        depth[valid] += rng.normal(scale=noise * depth[valid] ** 2)
+    if hole_rate > 0:
+        depth[rng.random(depth.shape) < hole_rate] = 0.
+    return depth
+
+
+class SyntheticCamera:
+    def __init__(self, distance, resolution=(640, 480), noise=0., hole_rate=0.,
+                 container=(0.6, 0.4, 0.3), seed=0):
+        """
+        Replaces the RSCamera with rendered depth maps of a container
+        seen from straight above. The container is filled with a
+        sloped surface so that its volume is known exactly.
+
+        The walls of the container are not rendered, outside of the
+        container the floor is seen 0.2 m below the container bottom
+
+        :param distance: distance in meters from the camera to the container bottom
+        :param resolution: resolution of the depth maps (width, height)
+        :param noise: depth noise, see degrade_depth
+        :param hole_rate: fraction of invalid pixels, see degrade_depth
+        :param container: inner size of the container (x, y, z) in meters
+        :param seed: seed for the noise and the holes
+        """
+        self.distance = distance
+        self.resolution = resolution
+        self.noise = noise
+        self.hole_rate = hole_rate
+        self.container = container
+        self.rng = np.random.default_rng(seed)
+        self.fill_rate = 0.
+
+    def volume(self):
+        """
+        The ground truth volume of the contents in the container
+
+        :return: volume in m^3
+        """
+        return self.fill_rate * self.container[0] * self.container[1] * self.container[2]
+
+    def config(self):
+        """
+        A config dictionary for a VolumeSensor looking at the container,
+        the bottom of the container is shifted to z=0
+
+        :return: config dictionary, see the config module
+        """
+        return {"volume_empty": 0., "volume_full": 1., "max_num_articles": 1,
+                "var_rot_x": 0., "var_rot_y": 0., "var_rot_z": 0.,
+                "var_shift_x": 0., "var_shift_y": 0., "var_shift_z": self.distance,
+                "var_border_max_x": self.container[0] / 2, "var_border_min_x": -self.container[0] / 2,
+                "var_border_max_y": self.container[1] / 2, "var_border_min_y": -self.container[1] / 2,
+                "var_border_max_z": self.container[2] + 0.1, "var_border_min_z": -0.1}
+
+    def render(self):
+        """
+        Renders a depth map of the container filled to the current fill rate
+
+        :return: depth map in meters (height, width)
+        """
+        width, height = self.resolution
+        half_x, half_y, depth_z = self.container[0] / 2, self.container[1] / 2, self.container[2]
+        u = np.arange(width) - width // 2
+        v = np.arange(height) - height // 2
+        kx = np.tan(FIELD_OF_VIEW[0] * pi / 360) / (width / 2)
+        ky = np.tan(FIELD_OF_VIEW[1] * pi / 360) / (height / 2)
+
+        # Surface height h = a + b * x, sloped in x around the mean height a
+        a = self.fill_rate * depth_z
+        b = 0.5 * min(self.fill_rate, 1 - self.fill_rate) * depth_z / half_x
+        # Solving depth = distance - h with x = kx * u * depth
+        surface = np.tile((self.distance - a) / (1 + b * kx * u), (height, 1))  # [h, w]
+        x = kx * u[np.newaxis, :] * surface
+        y = ky * v[:, np.newaxis] * surface
+        inside = (np.abs(x) < half_x) & (np.abs(y) < half_y)
+        depth = np.where(inside, surface, self.distance + 0.2)
+        return degrade_depth(depth, noise=self.noise, hole_rate=self.hole_rate, rng=self.rng)
+
+    def capture_images(self):
+        depth = self.render()
+        return np.zeros(depth.shape + (3,), dtype=np.uint8), depth
+
+    def close(self):
+        pass
+
+
+class RecordedCamera:
+    def __init__(self, depths, resolution=None, noise=0., hole_rate=0., seed=0):
+        """
+        Replaces the RSCamera with recorded depth maps, the depth maps
+        are returned in order and repeated when all have been returned
+
+        :param depths: list of depth maps in meters (height, width)
+        :param resolution: resolution of the depth maps (width, height), None keeps it
+        :param noise: added depth noise, see degrade_depth
+        :param hole_rate: fraction of added invalid pixels, see degrade_depth
+        :param seed: seed for the noise and the holes
+        """
+        self.depths = depths
+        self.resolution = resolution
+        self.noise = noise
+        self.hole_rate = hole_rate
+        self.rng = np.random.default_rng(seed)
+        self.index = 0
+
+    def capture_images(self):
+        depth = self.depths[self.index % len(self.depths)]
+        self.index += 1
+        depth = degrade_depth(depth, self.resolution, self.noise, self.hole_rate, self.rng)
+        return np.zeros(depth.shape + (3,), dtype=np.uint8), depth
+
+    def close(self):
+        pass
+
+
+def read_labels(session_path, labels_file="labels.csv"):
+    """
+    Reads the labelled fill rates of a recorded session
+
+    :param session_path: folder with the depth maps and the labels file
+    :param labels_file: name of the labels file
+    :return: dictionary of fill rates with the image paths as keys
+    """
+    labels = dict()
+    with open(os.path.join(session_path, labels_file), "r") as file:
+        for line in file.readlines():
+            line = line.strip().split(",")
+            if len(line) < 2:
+                continue
+            labels[os.path.join(session_path, line[0] + ".raw")] = float(line[1])
+    return labels
+
+
+def time_measurement(sensor, depth):
+    """
+    Processes a depth map into a fill rate with the volume sensor
+
+    :param sensor: a calibrated VolumeSensor
+    :param depth: depth map in meters
+    :return: fill rate, volume, wall-clock time in seconds
+    """
+    start = perf_counter()
+    sensor.process_depth(depth)
+    fill_rate = sensor.compute_fill_rate()
+    elapsed = perf_counter() - start
+    volume = sensor.volume_full + (1 - fill_rate) * (sensor.volume_empty - sensor.volume_full)
+    return fill_rate, volume, elapsed
+
+
+def peak_memory(sensor, depth):
+    """
+    Finds the peak memory allocated while processing a depth map into a fill rate
+
+    Only allocations made through Python and numpy are traced, the memory
+    used by qhull for the Delaunay triangulation in PointCloud.to_volume
+    is not counted, so the true peak memory is higher
+
+    :param sensor: a calibrated VolumeSensor
+    :param depth: depth map in meters
+    :return: peak traced memory in bytes
+    """
+    tracemalloc.start()
+    sensor.process_depth(depth)
+    sensor.compute_fill_rate()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return peak
+
+
+def evaluate(sensor, camera, scenes):
+    """
+    Runs the volume sensor on a number of scenes
+
+    :param sensor: a calibrated VolumeSensor using camera
+    :param camera: a SyntheticCamera or RecordedCamera
+    :param scenes: list of (set_scene, fill_rate, volume) where set_scene
+    is called to put the camera in the scene and volume may be None if unknown
+    :return: dictionary of errors, time and memory
+    """
+    fill_errors, volume_errors, times = [], [], []
+    depth = None
+    for set_scene, fill_rate, volume in scenes:
+        set_scene()
+        _, depth = camera.capture_images()
+        measured_fill_rate, measured_volume, elapsed = time_measurement(sensor, depth)
+        fill_errors.append(abs(measured_fill_rate - fill_rate))
+        if volume is not None:
+            volume_errors.append(abs(measured_volume - volume))
+        times.append(elapsed)
+    return {"fill_error": np.mean(fill_errors),
+            "max_fill_error": np.max(fill_errors),
+            "volume_error": np.mean(volume_errors) if volume_errors else np.nan,
+            "time": np.median(times),
+            "memory": peak_memory(sensor, depth)}
+
+
+def evaluate_synthetic(distances=(1.0, 1.5, 2.0, 3.0),
+                       resolutions=((640, 480), (320, 240), (160, 120)),
+                       noises=(0., 0.005),
+                       hole_rates=(0., 0.1),
+                       voxel_sizes=(0., 0.01),
+                       outlier_filters=("none", "statistical", "radius"),
+                       fill_rates=(0.1, 0.3, 0.5, 0.7, 0.9),
+                       num_calibration=3):
+    """
+    Evaluates the volume sensor on synthetic containers for all
+    combinations of the swept parameters
+
+    :param distances: camera distances in meters
+    :param resolutions: depth map resolutions (width, height)
+    :param noises: depth noises, see degrade_depth
+    :param hole_rates: fractions of invalid pixels
+    :param voxel_sizes: voxel sizes of the point cloud, 0 for no downsampling
+    :param outlier_filters: outlier filters of the point cloud, see VolumeSensor
+    :param fill_rates: the fill rates of the evaluated scenes
+    :param num_calibration: number of measurements for calibrating empty and full volume
+    :return: list of result dictionaries
+    """
+    results = []
+    for distance, resolution, voxel_size, outlier_filter, noise, hole_rate in \
+            product(distances, resolutions, voxel_sizes, outlier_filters, noises, hole_rates):
+        camera = SyntheticCamera(distance, resolution, noise, hole_rate)
+        cfg = camera.config()
+        cfg.update({"var_voxel_size": voxel_size, "outlier_filter": outlier_filter})
+        sensor = VolumeSensor(cfg, depth_camera=camera)
+        camera.fill_rate = 0.
+        sensor.calibrate_empty(num_calibration)
+        camera.fill_rate = 1.
+        sensor.calibrate_full(num_calibration)
+
+        scenes = []
+        for fill_rate in fill_rates:
+            camera.fill_rate = fill_rate
+            scenes.append((lambda f=fill_rate: setattr(camera, "fill_rate", f),
+                           fill_rate,
+                           camera.volume()))
+        result = evaluate(sensor, camera, scenes)
+        result.update({"scene": "synthetic", "distance": distance,
+                       "width": resolution[0], "height": resolution[1],
+                       "voxel_size": voxel_size, "outlier_filter": outlier_filter,
+                       "noise": noise, "hole_rate": hole_rate})
+        results.append(result)
+        print("Evaluated", format_result(result))
+    return results
+
+
+def evaluate_recorded(session_path,
+                      resolutions=((640, 480), (320, 240), (160, 120)),
+                      noises=(0.,),
+                      hole_rates=(0., 0.1),
+                      voxel_sizes=(0., 0.01),
+                      outlier_filters=("none", "statistical", "radius"),
+                      cfg=None):
+    """
+    Evaluates the volume sensor on a labelled recorded session for
+    all combinations of the swept parameters. The noise and the holes
+    are added on top of those already in the recording
+
+    :param session_path: folder with depth maps and labels, see read_labels,
+    images labelled 0.0 and 1.0 are only used for calibration
+    :param resolutions: depth map resolutions (width, height)
+    :param noises: added depth noises, see degrade_depth
+    :param hole_rates: fractions of added invalid pixels
+    :param voxel_sizes: voxel sizes of the point cloud, 0 for no downsampling
+    :param outlier_filters: outlier filters of the point cloud, see VolumeSensor
+    :param cfg: config dictionary for the volume sensor, read from config.csv if None
+    :return: list of result dictionaries
+    """
+    # Only imported here since RSCamera requires the RealSense SDK
+    from RSCamera import read_depth
+    if cfg is None:
+        cfg = read_config()
+    labels = read_labels(session_path)
+    depths = {path: read_depth(path) for path in labels.keys()}
+    empty = [depths[path] for path, fill_rate in labels.items() if fill_rate == 0.]
+    full = [depths[path] for path, fill_rate in labels.items() if fill_rate == 1.]
+    if not empty or not full:
+        raise ValueError("The session needs images labelled 0.0 and 1.0 for calibration")
+    # The calibration images are left out of the evaluation
+    labels = {path: fill_rate for path, fill_rate in labels.items() if fill_rate not in (0., 1.)}
+    if not labels:
+        raise ValueError("The session needs images with fill rates between 0.0 and 1.0 for evaluation")
+
+    results = []
+    for resolution, voxel_size, outlier_filter, noise, hole_rate in \
+            product(resolutions, voxel_sizes, outlier_filters, noises, hole_rates):
+        camera = RecordedCamera(empty, resolution, noise, hole_rate)
+        setting_cfg = dict(cfg)
+        setting_cfg.update({"var_voxel_size": voxel_size, "outlier_filter": outlier_filter})
+        sensor = VolumeSensor(setting_cfg, depth_camera=camera)
+        sensor.calibrate_empty(len(empty))
+        camera.depths, camera.index = full, 0
+        sensor.calibrate_full(len(full))
+
+        scenes = []
+        for path, fill_rate in labels.items():
+            scenes.append((lambda p=path: setattr(camera, "depths", [depths[p]]),
+                           fill_rate,
+                           None))
+        result = evaluate(sensor, camera, scenes)
+        result.update({"scene": os.path.basename(os.path.normpath(session_path)),
+                       "distance": np.nan,
+                       "width": resolution[0], "height": resolution[1],
+                       "voxel_size": voxel_size, "outlier_filter": outlier_filter,
+                       "noise": noise, "hole_rate": hole_rate})
+        results.append(result)
+        print("Evaluated", format_result(result))
+    return results
+
+
+def summarize(results):
+    """
+    Summarises the results of each setting of the sensor over all
+    conditions (noise and hole rate) with the worst error, time and memory
+
+    :param results: list of result dictionaries
+    :return: list of summary dictionaries, one for each setting
+    """
+    settings = dict()
+    for result in results:
+        settings.setdefault(tuple(result[key] for key in SETTING_KEYS), []).append(result)
+    summaries = []
+    for setting, group in settings.items():
+        summary = dict(zip(SETTING_KEYS, setting))
+        for key in ["fill_error", "max_fill_error", "volume_error", "time", "memory"]:
+            summary[key] = np.max([result[key] for result in group])
+        summaries.append(summary)
+    return summaries
+
+
+def mark_pareto(summaries):
+    """
+    Marks the summaries on the Pareto front of maximum fill rate error
+    versus time, i.e. the settings where no other setting of the same
+    scene source is both faster and at least as accurate
+
+    :param summaries: list of summary dictionaries
+    :return: the summaries, with the "pareto" key set
+    """
+    for summary in summaries:
+        summary["pareto"] = not any(
+            other["scene"] == summary["scene"] and
+            other["max_fill_error"] <= summary["max_fill_error"] and
+            other["time"] <= summary["time"] and
+            (other["max_fill_error"] < summary["max_fill_error"] or other["time"] < summary["time"])
+            for other in summaries)
+    return summaries
+
+
+def fastest_within_tolerance(summaries, tolerance=0.05, scene="synthetic"):
+    """
+    Finds the fastest setting of a scene source whose maximum fill rate
+    error is within tolerance
+
+    :param summaries: list of summary dictionaries
+    :param tolerance: the largest accepted fill rate error
+    :param scene: the scene source to consider
+    :return: summary dictionary, None if no setting meets the tolerance
+    """
+    accepted = [summary for summary in summaries
+                if summary["scene"] == scene and summary["max_fill_error"] <= tolerance]
+    if not accepted:
+        return None
+    return min(accepted, key=lambda summary: summary["time"])
+
+
+def format_result(result):
+    return "{:>10} {:>6.2f} {:>5}x{:<4} {:>5.3f} {:>11} {:>6.3f} {:>5.2f} {:>8.4f} {:>8.4f} {:>10.6f} {:>8.1f} {:>8.1f}".format(
+        result["scene"][:10], result["distance"], result["width"], result["height"],
+        result["voxel_size"], result["outlier_filter"], result["noise"], result["hole_rate"], result["fill_error"], result["max_fill_error"],
+        result["volume_error"], result["time"] * 1000, result["memory"] / 2 ** 20)
+
+
+def format_summary(summary):
+    return "{:>10} {:>6.2f} {:>5}x{:<4} {:>5.3f} {:>11} {:>8.4f} {:>8.4f} {:>10.6f} {:>8.1f} {:>8.1f} {:>3}".format(
+        summary["scene"][:10], summary["distance"], summary["width"], summary["height"],
+        summary["voxel_size"], summary["outlier_filter"],
+        summary["fill_error"], summary["max_fill_error"], summary["volume_error"],
+        summary["time"] * 1000, summary["memory"] / 2 ** 20,
+        "*" if summary.get("pareto") else "")
+
+
+def print_table(summaries):
+    """
+    Prints the summaries sorted by scene source and time, settings on
+    the Pareto front are marked with *
+
+    :param summaries: list of summary dictionaries
+    :return: None
+    """
+    print("{:>10} {:>6} {:>10} {:>5} {:>11} {:>8} {:>8} {:>10} {:>8} {:>8} {:>3}".format(
+        "scene", "dist", "resolution", "voxel", "outliers", "err", "max_err", "vol_err", "ms", "py_MiB", "pf"))
+    for summary in sorted(summaries, key=lambda summary: (summary["scene"], summary["time"])):
+        print(format_summary(summary))
+    print("Errors, time and memory are the worst over all noise and hole rate conditions, "
+          "py_MiB does not count the memory used by qhull")
+    return None
+
+
+def save_results(results, path="evaluation.csv", keys=RESULT_KEYS):
+    """
+    Saves results or summaries to a csv file
+
+    :param results: list of result or summary dictionaries
+    :param path: path to the csv file
+    :param keys: the keys of the dictionaries to save
+    :return: True
+    """
+    with open(path, "w") as file:
+        file.write(",".join(keys) + "\n")
+        for result in results:
+            file.write(",".join(str(result[key]) for key in keys) + "\n")
+    return True
+
+
+def main(session_path=None, tolerance=0.05, output_path="evaluation.csv",
+         conditions_path="evaluation_conditions.csv"):
+    """
+    Runs the evaluation, prints the Pareto table and the fastest
+    setting within tolerance of each scene source, and saves the results
+
+    :param session_path: folder of a labelled recorded session, None for only synthetic scenes
+    :param tolerance: the largest accepted fill rate error
+    :param output_path: path to the csv file with the summaries of each setting
+    :param conditions_path: path to the csv file with the results of each condition
+    :return: list of summary dictionaries
+    """
+    results = evaluate_synthetic()
+    if session_path is not None:
+        results += evaluate_recorded(session_path)
+    summaries = mark_pareto(summarize(results))
+    print_table(summaries)
+    for scene in sorted(set(summary["scene"] for summary in summaries)):
+        best = fastest_within_tolerance(summaries, tolerance, scene)
+        if best is None:
+            print("No setting for", scene, "meets the tolerance of ", str(tolerance))
+        else:
+            print("Fastest setting for", scene, "within tolerance of ", str(tolerance), ":")
+            print(format_summary(best))
+    save_results(summaries, output_path, SUMMARY_KEYS)
+    save_results(results, conditions_path, RESULT_KEYS)
+    print("Results saved to ", output_path, "and", conditions_path)
+    return summaries
+
+
+if __name__ == '__main__':
+    main()